@@ -1,121 +1,321 @@
 from __future__ import annotations
 
+import functools
 import logging
 from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Literal
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.feather as feather
 from kash.exec import kash_action
 from kash.model import Item, Param
-from kash.utils.file_utils.csv_utils import sniff_csv_metadata
+from kash.utils.file_utils.csv_utils import CsvMetadata, sniff_csv_metadata
 from kash.workspaces import current_ws
 
 log = logging.getLogger(__name__)
 
+ARROW_SUFFIXES = (".arrow", ".feather")
 
-def simplify_csv(
+
+@functools.lru_cache(maxsize=32)
+def _sniff_csv_metadata_cached(
     input_path: Path,
-    output_path: Path,
-    target_columns: list[str],
-    max_rows: int = 0,
-    column_transformations: dict[str, Callable[[str], str]] | None = None,
-) -> None:
+    mtime_ns: int,  # pyright: ignore[reportUnusedParameter]
+    size: int,  # pyright: ignore[reportUnusedParameter]
+) -> CsvMetadata:
     """
-    Process the CSV file to clean up format and extract specific columns.
+    Memoized `sniff_csv_metadata`, so repeat runs on an unchanged file skip rescanning it.
+    `mtime_ns` and `size` are only part of the cache key, to invalidate on modification.
     """
-    log.info("Processing CSV file: %s", input_path)
+    return sniff_csv_metadata(input_path)
 
-    # Detect how many rows to skip to get to actual data
-    csv_info = sniff_csv_metadata(input_path)
 
-    # Read CSV with pandas; let it handle encoding automatically
-    log.warning("Reading CSV file, skipping %d rows", csv_info.skip_rows)
-    df = pd.read_csv(
+def _read_csv_batches(  # pyright: ignore[reportUnknownParameterType]
+    input_path: Path,
+    read_options: pacsv.ReadOptions,  # pyright: ignore[reportUnknownParameterType]
+    parse_options: pacsv.ParseOptions,  # pyright: ignore[reportUnknownParameterType]
+    convert_options: pacsv.ConvertOptions,  # pyright: ignore[reportUnknownParameterType]
+    max_rows: int,
+) -> pa.Table:
+    """
+    Stream record batches with pyarrow. With `max_rows` set (0 means no limit) we stop
+    parsing as soon as we have enough rows. The file is memory-mapped so the parser reads
+    straight from the page cache, without a buffered read and copy per block.
+    """
+    batches: list[pa.RecordBatch] = []
+    num_rows = 0
+    with (
+        pa.memory_map(str(input_path)) as source,
+        pacsv.open_csv(
+            source,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        ) as reader,
+    ):
+        for batch in reader:
+            # Only stop once rows are actually cut, so a file with exactly `max_rows` rows
+            # is not reported as truncated. This may read one batch past an exact fill.
+            if max_rows > 0 and num_rows + batch.num_rows > max_rows:
+                log.info("Truncating data to %d rows", max_rows)
+                batches.append(batch.slice(0, max_rows - num_rows))
+                break
+            batches.append(batch)
+            num_rows += batch.num_rows
+        return pa.Table.from_batches(batches, schema=reader.schema)
+
+
+def _read_csv_pandas(
+    input_path: Path,
+    skip_rows: int,
+    columns: list[str],
+    max_rows: int,
+    engine: Literal["c", "python"],
+) -> pd.DataFrame:
+    """
+    Read with pandas, matching the pyarrow read: text columns, only empty cells null, rows
+    with extra fields skipped. All columns are parsed and `columns` picked afterwards, since
+    with `usecols` pandas keeps rows with extra fields.
+    """
+    return pd.read_csv(
         input_path,
-        skiprows=csv_info.skip_rows,
-        engine="python",
+        skiprows=skip_rows,
+        engine=engine,
         on_bad_lines="skip",
         encoding_errors="replace",
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+        nrows=max_rows or None,
+    ).reindex(columns=columns)
+
+
+def _value_counts(values: pd.Series) -> dict[Any, int]:
+    """
+    Value counts for logging. Categoricals are counted with a single `bincount` over their
+    codes, avoiding the group-by and sort of `value_counts`.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        codes = values.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        return dict(zip(categories, counts.tolist(), strict=True))
+    return values.value_counts().to_dict()
+
+
+def _read_target_columns(
+    input_path: Path, target_columns: list[str], max_rows: int
+) -> pd.DataFrame:
+    """
+    Read the target columns present in the CSV, reporting any that are missing.
+    """
+    log.info("Processing CSV file: %s", input_path)
+
+    # Detect how many rows to skip to get to actual data
+    stat = input_path.stat()
+    csv_info = _sniff_csv_metadata_cached(input_path, stat.st_mtime_ns, stat.st_size)
+
+    read_options = pacsv.ReadOptions(
+        skip_rows=csv_info.skip_rows, use_threads=True, block_size=8 << 20
+    )
+    skipped_rows = 0
+
+    def skip_long_rows(row: Any) -> str:
+        # Match pandas' on_bad_lines="skip", which only drops rows with extra fields. Short
+        # rows are an error here, so they go to the pandas fallback, which pads them.
+        nonlocal skipped_rows
+        if row.actual_columns > row.expected_columns:
+            skipped_rows += 1
+            return "skip"
+        return "error"
+
+    parse_options = pacsv.ParseOptions(invalid_row_handler=skip_long_rows)
+
+    # Read only the header row, so missing columns are reported before any parsing and
+    # the main read below can convert just the target columns.
+    header = list(
+        pd.read_csv(
+            input_path, skiprows=csv_info.skip_rows, nrows=0, encoding_errors="replace"
+        ).columns
     )
-    log.info("Successfully read CSV with shape: %s", df.shape)
 
-    log.info("Columns found: %d", len(df.columns))
+    log.info("Columns found: %d", len(header))
 
     # Check which target columns exist
-    existing_columns = []
-    missing_columns = []
-
-    for col in target_columns:
-        if col in df.columns:
-            existing_columns.append(col)
-        else:
-            missing_columns.append(col)
+    header_set = set(header)
+    existing_columns = [col for col in target_columns if col in header_set]
+    missing_columns = [col for col in target_columns if col not in header_set]
 
     log.info("Found %d of %d target columns", len(existing_columns), len(target_columns))
 
     if missing_columns:
         log.error("Missing columns:\n%s", "\n".join(f"  - {col!r}" for col in missing_columns))
 
-        # Try to find similar column names
-        for missing_col in missing_columns:
-            similar_cols = [
-                col
-                for col in df.columns
-                if missing_col.lower() in col.lower() or col.lower() in missing_col.lower()
-            ]
-            if similar_cols:
-                log.info("For %r, found similar: %r", missing_col, similar_cols)
+        # Try to find similar column names (only useful if it will be logged)
+        if log.isEnabledFor(logging.INFO):
+            lower_header = [(col, col.lower()) for col in header]
+            for missing_col in missing_columns:
+                missing_lower = missing_col.lower()
+                similar_cols = [
+                    col
+                    for col, col_lower in lower_header
+                    if missing_lower in col_lower or col_lower in missing_lower
+                ]
+                if similar_cols:
+                    log.info("For %r, found similar: %r", missing_col, similar_cols)
 
     if not existing_columns:
         raise ValueError("No target columns found! Cannot proceed.")
 
-    # Extract the existing columns
-    filtered_df = df[existing_columns].copy()
+    # Everything is consumed as text downstream, so skip type inference. Only empty cells
+    # are null: answers like "None" or "NA" are kept as-is and no NA-string matching runs.
+    convert_options = pacsv.ConvertOptions(
+        include_columns=existing_columns,
+        column_types={col: pa.string() for col in existing_columns},
+        null_values=[""],
+        strings_can_be_null=True,
+    )
 
-    # Truncate to max_rows if specified (0 means no limit)
-    if max_rows > 0 and len(filtered_df) > max_rows:
-        log.info("Truncating data from %d to %d rows", len(filtered_df), max_rows)
-        filtered_df = filtered_df.head(max_rows)
+    log.warning("Reading CSV file, skipping %d rows", csv_info.skip_rows)
+    try:
+        table = _read_csv_batches(
+            input_path, read_options, parse_options, convert_options, max_rows
+        )
+    except pa.ArrowInvalid as e:
+        # pyarrow rejects some files pandas can still read (e.g. invalid UTF-8, or short
+        # rows, which pandas pads with nulls). Fall back to pandas' C engine, and to the slow
+        # Python engine only if that fails too.
+        log.warning("Fast CSV parse failed, falling back to pandas: %s", e)
+        try:
+            filtered_df = _read_csv_pandas(
+                input_path, csv_info.skip_rows, existing_columns, max_rows, engine="c"
+            )
+        except pd.errors.ParserError as e:
+            log.warning("C engine parse failed, falling back to Python engine: %s", e)
+            filtered_df = _read_csv_pandas(
+                input_path, csv_info.skip_rows, existing_columns, max_rows, engine="python"
+            )
+    else:
+        if skipped_rows:
+            log.warning("Skipped %d malformed rows with too many fields", skipped_rows)
+        log.info("Successfully read CSV with shape: %s", table.shape)
+        filtered_df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+
+    return filtered_df
 
+
+def _transform_and_write(  # pyright: ignore[reportUnknownParameterType]
+    filtered_df: pd.DataFrame,
+    output_path: Path,
+    column_transformations: dict[str, Callable[[pd.Series], pd.Series]] | None,
+) -> pa.Table:
     # Apply column transformations
     if column_transformations:
+        present_columns = set(filtered_df.columns)
         for column_name, transform_func in column_transformations.items():
-            if column_name in filtered_df.columns:
+            if column_name in present_columns:
                 log.info("Applying transformation to column: %s", column_name)
-                column_series = filtered_df[column_name].fillna("").astype(str)  # pyright: ignore
-                filtered_df[column_name] = column_series.apply(transform_func)
-                log.info(
-                    "Column '%s' values after transformation: %s",
-                    column_name,
-                    filtered_df[column_name].value_counts().to_dict(),  # pyright: ignore
-                )
+                filtered_df[column_name] = transform_func(filtered_df[column_name])  # pyright: ignore
+                if log.isEnabledFor(logging.INFO):
+                    log.info(
+                        "Column '%s' values after transformation: %s",
+                        column_name,
+                        _value_counts(filtered_df[column_name]),  # pyright: ignore
+                    )
 
     log.info("Filtered data shape: %s", filtered_df.shape)
-    log.info("Non-null values per column:")
-    for col in filtered_df.columns:
-        non_null_count = filtered_df[col].count()  # pyright: ignore
+    if log.isEnabledFor(logging.INFO):
+        log.info("Non-null values per column:")
+        non_null_counts = filtered_df.count()
         total_count = len(filtered_df)
-        log.info(
-            "  %s: %d/%d (%.1f%%)",
-            col,
-            non_null_count,
-            total_count,
-            non_null_count / total_count * 100,
-        )
+        for col, non_null_count in non_null_counts.items():
+            log.info(
+                "  %s: %d/%d (%.1f%%)",
+                col,
+                non_null_count,
+                total_count,
+                non_null_count / total_count * 100 if total_count else 0.0,
+            )
 
     # Write to output file
-    filtered_df.to_csv(output_path, index=False)
+    table = pa.Table.from_pandas(filtered_df, preserve_index=False)
+    if output_path.suffix in ARROW_SUFFIXES:
+        feather.write_feather(table, output_path, compression="uncompressed")
+    else:
+        # Arrow's writer quotes all string fields, which is valid CSV.
+        pacsv.write_csv(table, output_path)
 
+    return table
 
-def simplify_sentiment(value: str) -> str:
-    if "more excited" in value.lower():
-        return "excited"
-    elif "more concerned" in value.lower():
-        return "concerned"
-    elif "equally" in value.lower():
-        return "neutral"
-    else:
-        return ""
+
+def simplify_csv(  # pyright: ignore[reportUnknownParameterType]
+    input_path: Path,
+    output_path: Path,
+    target_columns: list[str],
+    max_rows: int = 0,
+    column_transformations: dict[str, Callable[[pd.Series], pd.Series]] | None = None,
+) -> pa.Table:
+    """
+    Process the CSV file to clean up format and extract specific columns.
+
+    Writes CSV, or an uncompressed Arrow IPC file if `output_path` ends in `.arrow` or
+    `.feather`, which consumers can memory-map with `pyarrow.feather.read_table` and
+    skip reparsing text. Returns the table as written, so in-process callers can use it
+    without reading the output back.
+    """
+    filtered_df = _read_target_columns(input_path, target_columns, max_rows)
+    return _transform_and_write(filtered_df, output_path, column_transformations)
+
+
+def simplify_many_csvs(  # pyright: ignore[reportUnknownParameterType]
+    input_paths: list[Path],
+    output_path: Path,
+    target_columns: list[str],
+    max_rows: int = 0,
+    column_transformations: dict[str, Callable[[pd.Series], pd.Series]] | None = None,
+) -> pa.Table:
+    """
+    Same as `simplify_csv` but combines several CSVs (e.g. one per dialogue) into one
+    output. Files are parsed concurrently in threads, as pyarrow releases the GIL while
+    parsing. `max_rows` caps the combined output, in input order.
+    """
+    read = functools.partial(_read_target_columns, target_columns=target_columns, max_rows=max_rows)
+    with ThreadPoolExecutor() as executor:
+        frames = list(executor.map(read, input_paths))
+    filtered_df = pd.concat(frames, ignore_index=True)
+    if max_rows > 0:
+        filtered_df = filtered_df.head(max_rows)
+    return _transform_and_write(filtered_df, output_path, column_transformations)
+
+
+SENTIMENT_CATEGORIES = ["", "excited", "concerned", "neutral"]
+
+
+def simplify_sentiment_series(values: pd.Series) -> pd.Series:
+    """
+    Map free-text sentiment answers to "excited", "concerned", "neutral", or "".
+    Matching runs as case-insensitive substring search in Arrow's native kernels, so there
+    is no per-row Python call and no lowercased copy of the column.
+    """
+    text = pa.array(values, type=pa.string(), from_pandas=True)
+    matches = [
+        pc.match_substring(text, pattern, ignore_case=True)  # pyright: ignore
+        for pattern in ("more excited", "more concerned", "equally")
+    ]
+    # Nulls count as no match.
+    conditions = [pc.fill_null(match, False).to_numpy(zero_copy_only=False) for match in matches]
+    # Categorical, so each row holds an int8 code rather than a string object.
+    codes = np.select(conditions, [1, 2, 3], default=0).astype(np.int8)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=SENTIMENT_CATEGORIES), index=values.index
+    )
 
 
 # Participants data.
@@ -130,9 +330,11 @@ TARGET_COLUMNS = [
     "What religious group or faith do you most identify with?",
     # "Participant Id",
 ]
-COLUMN_TRANSFORMATIONS: dict[str, Callable[[str], str]] = {
-    "Overall, would you say the increased use of artificial intelligence (AI) in daily life makes you feel…": simplify_sentiment,
+COLUMN_TRANSFORMATIONS: dict[str, Callable[[pd.Series], pd.Series]] = {
+    "Overall, would you say the increased use of artificial intelligence (AI) in daily life makes you feel…": simplify_sentiment_series,
 }
+# Transformations only ever apply to columns we extract.
+assert set(COLUMN_TRANSFORMATIONS).issubset(TARGET_COLUMNS)
 
 
 @kash_action(
@@ -142,17 +344,17 @@ def gd_csv_simplify_participants(item: Item, max_rows: int = 0) -> Item:
     """
     Clean up/simplify the Global Dialogues participant CSV file.
     """
-    ws = current_ws()
     assert item.store_path
 
+    # Resolve workspace paths once up front; `simplify_csv` itself is workspace-agnostic.
+    ws = current_ws()
+    input_path = ws.base_dir / item.store_path
     simplified_data = item.derived_copy(title="participants_simple")
     target_path = ws.target_path_for(simplified_data)
 
     log.warning("Simplifying data to: %s", target_path)
 
-    simplify_csv(
-        ws.base_dir / item.store_path, target_path, TARGET_COLUMNS, max_rows, COLUMN_TRANSFORMATIONS
-    )
+    simplify_csv(input_path, target_path, TARGET_COLUMNS, max_rows, COLUMN_TRANSFORMATIONS)
     simplified_data.external_path = str(target_path)
 
     log.warning("Simplified data: %s", simplified_data)
@@ -163,18 +365,34 @@ def gd_csv_simplify_participants(item: Item, max_rows: int = 0) -> Item:
 ## Tests
 
 
-def test_simplify_sentiment() -> None:
-    """Test the simplify_sentiment function."""
-    assert simplify_sentiment("more excited") == "excited"
-    assert simplify_sentiment("MORE EXCITED") == "excited"
-    assert simplify_sentiment("more concerned") == "concerned"
-    assert simplify_sentiment("MORE CONCERNED") == "concerned"
-    assert simplify_sentiment("equally") == "neutral"
-    assert simplify_sentiment("EQUALLY") == "neutral"
-    assert simplify_sentiment("something else") == ""
-    assert simplify_sentiment("") == ""
+def test_simplify_sentiment_series() -> None:
+    """Test the simplify_sentiment_series function."""
+    values = pd.Series(
+        [
+            "more excited",
+            "MORE EXCITED",
+            "more concerned",
+            "MORE CONCERNED",
+            "equally",
+            "EQUALLY",
+            "something else",
+            "",
+            None,
+        ]
+    )
+    assert simplify_sentiment_series(values).tolist() == [
+        "excited",
+        "excited",
+        "concerned",
+        "concerned",
+        "neutral",
+        "neutral",
+        "",
+        "",
+        "",
+    ]
 
 
 if __name__ == "__main__":
-    test_simplify_sentiment()
+    test_simplify_sentiment_series()
     print("✅ All tests passed!")
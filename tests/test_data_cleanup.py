@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import logging
 import tempfile
 from pathlib import Path
 
 import pandas as pd
+import pyarrow.feather as feather
 import pytest
 
-from global_dialogues_viz.gd_csv_cleanup import simplify_csv
+from global_dialogues_viz.gd_csv_cleanup import (
+    COLUMN_TRANSFORMATIONS,
+    simplify_csv,
+    simplify_many_csvs,
+)
 
 
 def test_simplify_csv_basic():
@@ -127,10 +133,10 @@ Row5Col1,Row5Col2,Row5Col3
 
     # Should have header + 3 data rows = 4 lines total
     assert len(lines) == 4
-    assert lines[0] == "Header1,Header2"
-    assert lines[1] == "Row1Col1,Row1Col2"
-    assert lines[2] == "Row2Col1,Row2Col2"
-    assert lines[3] == "Row3Col1,Row3Col2"
+    assert lines[0] == '"Header1","Header2"'
+    assert lines[1] == '"Row1Col1","Row1Col2"'
+    assert lines[2] == '"Row2Col1","Row2Col2"'
+    assert lines[3] == '"Row3Col1","Row3Col2"'
 
 
 def test_simplify_csv_max_rows_zero_means_no_limit(tmp_path: Path) -> None:
@@ -158,9 +164,170 @@ Row5Col1,Row5Col2,Row5Col3
 
     # Should have header + 5 data rows = 6 lines total
     assert len(lines) == 6
-    assert lines[0] == "Header1,Header2"
-    assert lines[1] == "Row1Col1,Row1Col2"
-    assert lines[2] == "Row2Col1,Row2Col2"
-    assert lines[3] == "Row3Col1,Row3Col2"
-    assert lines[4] == "Row4Col1,Row4Col2"
-    assert lines[5] == "Row5Col1,Row5Col2"
+    assert lines[0] == '"Header1","Header2"'
+    assert lines[1] == '"Row1Col1","Row1Col2"'
+    assert lines[2] == '"Row2Col1","Row2Col2"'
+    assert lines[3] == '"Row3Col1","Row3Col2"'
+    assert lines[4] == '"Row4Col1","Row4Col2"'
+    assert lines[5] == '"Row5Col1","Row5Col2"'
+
+
+def test_simplify_csv_keeps_values_as_text(tmp_path: Path) -> None:
+    """Test that values are copied through as text, without type or NA conversion."""
+    csv_content = """Religion,Age,City
+None,007,NYC
+NA,,Paris
+"""
+
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_text(csv_content)
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_csv(input_file, output_file, ["Religion", "Age"])
+
+    lines = output_file.read_text().strip().split("\n")
+    assert lines == ['"Religion","Age"', '"None","007"', '"NA",']
+
+
+def test_simplify_csv_invalid_utf8_falls_back(tmp_path: Path) -> None:
+    """Test that a file pyarrow rejects (invalid UTF-8) is still read, with replacement."""
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_bytes(b"Name,Age,City\nJo\xffhn,25,NYC\nJane,30,Paris\n")
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_csv(input_file, output_file, ["Name", "Age"])
+
+    lines = output_file.read_text().strip().split("\n")
+    assert lines == ['"Name","Age"', '"Jo�hn","25"', '"Jane","30"']
+
+
+def test_simplify_csv_arrow_output(tmp_path: Path) -> None:
+    """Test that an `.arrow` output path writes an Arrow IPC file instead of CSV."""
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_text("Name,Age,City\nJohn,25,NYC\nJane,,Paris\n")
+
+    output_file = tmp_path / "test_output.arrow"
+
+    written = simplify_csv(input_file, output_file, ["Name", "Age"])
+
+    table = feather.read_table(output_file)
+    assert table.column_names == ["Name", "Age"]
+    assert table.to_pydict() == {"Name": ["John", "Jane"], "Age": ["25", None]}
+    assert table.equals(written)
+
+
+def test_simplify_many_csvs(tmp_path: Path) -> None:
+    """Test that several CSVs are combined in input order, with `max_rows` on the total."""
+    first = tmp_path / "first.csv"
+    first.write_text("Name,Age,City\nJohn,25,NYC\nJane,30,Paris\n")
+    second = tmp_path / "second.csv"
+    second.write_text("Survey,September\n\nCity,Name,Age\nLondon,Bob,35\nRome,Ann,40\n")
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_many_csvs([first, second], output_file, ["Name", "Age"], max_rows=3)
+
+    df = pd.read_csv(output_file)
+    assert list(df.columns) == ["Name", "Age"]
+    assert df["Name"].tolist() == ["John", "Jane", "Bob"]
+    assert df["Age"].tolist() == [25, 30, 35]
+
+
+def test_simplify_csv_short_and_long_rows(tmp_path: Path) -> None:
+    """Test that short rows are kept and padded, while rows with extra fields are dropped."""
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_text(
+        "Name,Age,City,Country,Pet\n"
+        "John,25\n"
+        "Jane,30,Paris,France,Cat\n"
+        "Bob\n"
+        "Eve,40,Rome,Italy,Dog,Extra\n"
+    )
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_csv(input_file, output_file, ["Name", "Age"])
+
+    df = pd.read_csv(output_file)
+    assert df["Name"].tolist() == ["John", "Jane", "Bob"]
+    assert df["Age"].tolist()[:2] == [25, 30]
+    assert pd.isna(df["Age"].iloc[2])
+
+
+def test_simplify_csv_header_only(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test a CSV with no data rows, with INFO logging on so the stats are computed."""
+    caplog.set_level(logging.INFO)
+
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_text("Name,Age,City\n")
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_csv(input_file, output_file, ["Name", "Age"])
+
+    df = pd.read_csv(output_file)
+    assert list(df.columns) == ["Name", "Age"]
+    assert len(df) == 0
+    assert "Name: 0/0 (0.0%)" in caplog.text
+
+
+def test_simplify_csv_sentiment_transformation(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test the sentiment transformation end to end, including the logged value counts."""
+    caplog.set_level(logging.INFO)
+
+    sentiment_col = next(iter(COLUMN_TRANSFORMATIONS))
+    input_file = tmp_path / "test_input.csv"
+    pd.DataFrame(
+        {
+            "Name": ["John", "Jane", "Bob", "Ann", "Eve"],
+            sentiment_col: [
+                "More excited than concerned",
+                "More concerned than excited",
+                "Equally concerned and excited",
+                "",
+                "MORE EXCITED than concerned",
+            ],
+            "City": ["NYC", "Paris", "London", "Rome", "Oslo"],
+        }
+    ).to_csv(input_file, index=False)
+
+    output_file = tmp_path / "test_output.csv"
+    simplify_csv(input_file, output_file, ["Name", sentiment_col], 0, COLUMN_TRANSFORMATIONS)
+
+    df = pd.read_csv(output_file, keep_default_na=False)
+    assert df[sentiment_col].tolist() == ["excited", "concerned", "neutral", "", "excited"]
+    assert "{'': 1, 'excited': 2, 'concerned': 1, 'neutral': 1}" in caplog.text
+
+    arrow_file = tmp_path / "test_output.arrow"
+    simplify_csv(input_file, arrow_file, ["Name", sentiment_col], 0, COLUMN_TRANSFORMATIONS)
+
+    table = feather.read_table(arrow_file)
+    assert table.column(sentiment_col).to_pylist() == [
+        "excited",
+        "concerned",
+        "neutral",
+        "",
+        "excited",
+    ]
+
+
+def test_simplify_csv_truncation_log(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    """Test that truncation is only logged when rows are actually dropped."""
+    caplog.set_level(logging.INFO)
+
+    input_file = tmp_path / "test_input.csv"
+    input_file.write_text("Name,Age,City\nJohn,25,NYC\nJane,30,Paris\nBob,35,London\n")
+
+    output_file = tmp_path / "test_output.csv"
+
+    simplify_csv(input_file, output_file, ["Name", "Age"], max_rows=3)
+    assert "Truncating" not in caplog.text
+    assert len(pd.read_csv(output_file)) == 3
+
+    simplify_csv(input_file, output_file, ["Name", "Age"], max_rows=2)
+    assert "Truncating data to 2 rows" in caplog.text
+    assert len(pd.read_csv(output_file)) == 2